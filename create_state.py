@@ -227,7 +227,7 @@ class TTC:
             if ITEM_INDEX_JSON.exists():
                 obj = json.loads(ITEM_INDEX_JSON.read_text(encoding="utf-8"))
                 self.item_index = obj.get("map", {})
-                log.info(f"✅ {len(self.item_index)} item index yüklendi.")
+                log.info("✅ %d item index yüklendi.", len(self.item_index))
             else:
                 log.info("ℹ️ Item index dosyası bulunamadı (devam).")
         except Exception as e:
@@ -247,14 +247,14 @@ class TTC:
             # Birim fiyatı almamız gerekiyor (ilk satır)
             lines = [line.strip() for line in price_text.strip().split('\n') if line.strip()]
             
-            log.debug(f"Tüm satırlar: {lines}")
+            log.debug("Tüm satırlar: %s", lines)
             
             # İlk satırı al (birim fiyat)
             if not lines:
                 return None
                 
             unit_price_line = lines[0]
-            log.debug(f"Birim fiyat satırı: '{unit_price_line}'")
+            log.debug("Birim fiyat satırı: '%s'", unit_price_line)
             
             # Sadece rakam, nokta, virgül kalsın
             clean_text = re.sub(r'[^\d\.,]', '', unit_price_line)
@@ -297,15 +297,15 @@ class TTC:
             # En makul fiyatı seç (sadece 0'dan büyük olsun)
             for price in possible_prices:
                 if price > 0:  # Sadece pozitif sayılar
-                    log.debug(f"Parse edildi: '{unit_price_line}' -> {price}g (birim)")
+                    log.debug("Parse edildi: '%s' -> %dg (birim)", unit_price_line, price)
                     return price
             
             # Hiçbiri geçerli değilse None döndür
-            log.warning(f"Geçerli birim fiyat bulunamadı: '{unit_price_line}' -> {possible_prices}")
+            log.warning("Geçerli birim fiyat bulunamadı: '%s' -> %s", unit_price_line, possible_prices)
             return None
             
         except Exception as e:
-            log.warning(f"Fiyat parse hatası ('{price_text}'): {e}")
+            log.warning("Fiyat parse hatası ('%s'): %s", price_text, e)
             return None
 
     async def fetch_price(self, item_name: str, headless: bool = True) -> PriceResult:
@@ -392,22 +392,20 @@ class TTC:
                     page = await context.new_page()
                     await page.goto(url, wait_until="domcontentloaded")
 
-                    # Kullanıcı çözsün, bekle
+                    # Kullanıcı çözsün; 2 sn'lik poll yerine event-driven
+                    # bekleme: modal DOM'dan gizlenir gizlenmez uyanır
                     solved = False
-                    for i in range(120):  # 4 dakika bekle
+                    try:
+                        await page.wait_for_selector(
+                            "#captcha-modal", state="hidden", timeout=240000
+                        )
+                        solved = True
+                    except Exception:
                         try:
-                            captcha_modal = await page.query_selector("#captcha-modal")
-                            if not captcha_modal or not await captcha_modal.is_visible():
+                            if await page.query_selector("table.trade-list-table tbody tr"):
                                 solved = True
-                                break
                         except Exception:
-                            try:
-                                if await page.query_selector("table.trade-list-table tbody tr"):
-                                    solved = True
-                                    break
-                            except Exception:
-                                pass
-                        await asyncio.sleep(2)
+                            pass
 
                     if solved:
                         log.info("✅ Captcha çözüldü, tablo açıldı!")
@@ -440,7 +438,7 @@ class TTC:
                         log.warning("Captcha tespit edildi!")
                         return PriceResult(item_id, None, None, None, url, "captcha")
                 else:
-                    log.info(f"📊 {len(rows)} listeleme bulundu: {item_name}")
+                    log.info("📊 %d listeleme bulundu: %s", len(rows), item_name)
                     
                     lowest_price = None
                     best_row = None
@@ -448,9 +446,10 @@ class TTC:
                     # Tüm satırları kontrol et ve en düşük fiyatı bul
                     for i, row in enumerate(rows[:15]):  # İlk 15 satırı kontrol et
                         try:
-                            # Debug: Tüm satır içeriğini logla
-                            row_html = await row.inner_html()
-                            log.debug(f"Satır {i+1} HTML: {row_html[:200]}...")
+                            # Debug: satır içeriği sadece DEBUG açıkken çekilir
+                            if log.isEnabledFor(logging.DEBUG):
+                                row_html = await row.inner_html()
+                                log.debug("Satır %d HTML: %s...", i + 1, row_html[:200])
                             
                             # Daha geniş fiyat selector'ları
                             price_cell = await row.query_selector("td.gold-amount.bold")
@@ -467,12 +466,12 @@ class TTC:
                                     cell_text = await cell.inner_text()
                                     if re.search(r'\d+[.\,]?\d*[.\,]?\d*\s*(gold|g)?', cell_text, re.IGNORECASE):
                                         price_cell = cell
-                                        log.debug(f"Fiyat hücresi bulundu {j+1}. td'de: {cell_text}")
+                                        log.debug("Fiyat hücresi bulundu %d. td'de: %s", j + 1, cell_text)
                                         break
                             
                             if price_cell:
                                 price_text = await price_cell.inner_text()
-                                log.debug(f"Ham fiyat metni (satır {i+1}): '{price_text}'")
+                                log.debug("Ham fiyat metni (satır %d): '%s'", i + 1, price_text)
                                 
                                 current_price = self._parse_price(price_text)
                                 
@@ -481,14 +480,14 @@ class TTC:
                                         lowest_price = current_price
                                         best_row = row
                                         
-                                    log.debug(f"Satır {i+1}: {price_text} -> {current_price}g")
+                                    log.debug("Satır %d: %s -> %dg", i + 1, price_text, current_price)
                                 else:
-                                    log.warning(f"Geçersiz fiyat (satır {i+1}): '{price_text}'")
+                                    log.warning("Geçersiz fiyat (satır %d): '%s'", i + 1, price_text)
                             else:
-                                log.warning(f"Satır {i+1}'de fiyat hücresi bulunamadı")
+                                log.warning("Satır %d'de fiyat hücresi bulunamadı", i + 1)
                                     
                         except Exception as e:
-                            log.warning(f"Satır {i+1} işlenirken hata: {e}")
+                            log.warning("Satır %d işlenirken hata: %s", i + 1, e)
                             continue
                     
                     # En iyi satırdan bilgileri çek
@@ -514,7 +513,7 @@ class TTC:
                 log.warning("Tablo parse hatası: %s", e)
                 # Sayfanın tam yüklenip yüklenmediğini kontrol et
                 page_title = await page.title()
-                log.debug(f"Sayfa başlığı: {page_title}")
+                log.debug("Sayfa başlığı: %s", page_title)
                 if "captcha" in page_title.lower():
                     source = "captcha"
 
@@ -829,7 +828,7 @@ class Bot:
                 await loading_msg.delete()
             except:
                 pass
-            log.error(f"Test komutu hatası: {e}")
+            log.error("Test komutu hatası: %s", e)
             await u.message.reply_html(
                 f"❌ <b>Hata oluştu!</b>\n\n"
                 f"🎯 <b>Item:</b> {esc_html(item)}\n"
@@ -892,7 +891,7 @@ class Bot:
                         )
                     
                 except Exception as e:
-                    log.warning(f"Manuel kontrol hatası ({alert['item_name']}): {e}")
+                    log.warning("Manuel kontrol hatası (%s): %s", alert['item_name'], e)
                     continue
             
             final_text = (
@@ -8,13 +8,18 @@ main.py — ESO Price Tracker (Playwright + storage_state captcha bypass)
 """
 
 import asyncio
+import functools
 import json
 import logging
 import os
+import pickle
 import re
 import sqlite3
+import statistics
+import sys
+import threading
 import time
-import random
+from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -22,8 +27,15 @@ from urllib.parse import quote
 from telegram.request import HTTPXRequest
 from dotenv import load_dotenv
 from playwright.async_api import async_playwright
+
+# Opsiyonel: orjson varsa büyük index JSON'u C tarafında parse edilir
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
+from telegram.error import RetryAfter
 from telegram.ext import (
     Application,
     CallbackQueryHandler,
@@ -42,7 +54,14 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
 TTC_REGION = os.getenv("TTC_REGION", "eu").strip().lower()  # default eu
 CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", "300"))  # seconds
 ALERT_COOLDOWN = int(os.getenv("ALERT_COOLDOWN", "600"))  # seconds
+# TTC scrape hızı: saniyedeki ortalama istek + burst üst sınırı
+TTC_REQ_RATE = float(os.getenv("TTC_REQ_RATE", "0.5"))
+TTC_REQ_BURST = int(os.getenv("TTC_REQ_BURST", "3"))
 PROXIES = [p.strip() for p in os.getenv("PROXIES", "").split(",") if p.strip()]
+# Opsiyonel: chrome-headless-shell binary'sinin yolu. Verilirse headless
+# fetch'ler tam Chromium yerine onu kullanır (daha hızlı soğuk açılış,
+# ~4x düşük RSS). Headful /test her zaman tam Chromium'la açılır.
+CHROME_SHELL_PATH = os.getenv("CHROME_SHELL_PATH", "").strip()
 
 if not BOT_TOKEN:
     raise SystemExit("❌ BOT_TOKEN .env içinde olmalı.")
@@ -50,7 +69,7 @@ if not BOT_TOKEN:
 # logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.DEBUG  # prod'da INFO yapabilirsin
+    level=os.getenv("LOG_LEVEL", "INFO").upper()  # gerekirse LOG_LEVEL=DEBUG
 )
 log = logging.getLogger("ESOPriceBot")
 
@@ -59,39 +78,221 @@ BASE_DIR = Path(__file__).parent
 CACHE_DIR = BASE_DIR / "cache"
 CACHE_DIR.mkdir(exist_ok=True)
 ITEM_INDEX_JSON = CACHE_DIR / f"ttc_item_index_{TTC_REGION}.json"
+# JSON'dan bir kez parse edilip pickle'lanan hazır dict (soğuk açılış hızı)
+ITEM_INDEX_PKL = CACHE_DIR / f"ttc_item_index_{TTC_REGION}.pkl"
+# Yazım hatalı aramalar için FTS5 fallback indeksi
+ITEM_INDEX_DB = CACHE_DIR / f"ttc_item_index_{TTC_REGION}.sqlite"
 STORAGE_STATE = CACHE_DIR / "storage_state.json"
 
 # -------------------------
 # Utils
 # -------------------------
-def esc_html(s: str) -> str:
-    return (
-        str(s)
-        .replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-    )
+# İkisi de saf fonksiyon; alert kartları aynı item adları/fiyatlarıyla
+# tekrar tekrar render edildiği için memoize ediliyor.
+_HTML_ESCAPE = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}
+_HTML_ESCAPE_RE = re.compile("|".join(map(re.escape, _HTML_ESCAPE)))
 
+@functools.lru_cache(maxsize=4096)
+def esc_html(s: str) -> str:
+    # Tek geçişli sub: 4 zincirleme .replace'in her biri string'i baştan
+    # tarayıp yeni kopya üretiyordu.
+    return _HTML_ESCAPE_RE.sub(lambda m: _HTML_ESCAPE[m.group(0)], str(s))
+
+_ERR_ESC = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
+def _fmt_err(e: BaseException, n: int = 100) -> str:
+    """Hata metnini HTML-escape edip n karaktere kısaltır.
+
+    esc_html kullanılmıyor: hata mesajları hep benzersiz olduğundan oradaki
+    lru_cache'i kirletirler. Kesim escape'ten SONRA yapılır; kesim bir
+    entity'nin ortasına denk gelirse kuyruk atılır ki Telegram HTML parse'ı
+    bozulmasın."""
+    s = str(e).translate(_ERR_ESC)[:n]
+    amp = s.rfind("&")
+    if amp != -1 and ";" not in s[amp:]:
+        s = s[:amp]
+    return s
+
+@functools.lru_cache(maxsize=4096)
 def fmt_gold(n: int) -> str:
-    try:
-        return f"{int(n):,}".replace(",", ".")
-    except Exception:
-        return str(n)
+    # Çağıranlar hep DB'den/parse'tan gelen int geçiyor; try/except'e gerek yok
+    return f"{n:,}".replace(",", ".")
 
 def now_ts() -> int:
     return int(time.time())
 
+@functools.lru_cache(maxsize=1)
+def _hhmm(minute_epoch: int) -> str:
+    return time.strftime("%H:%M", time.localtime(minute_epoch * 60))
+
+def now_hhmm() -> str:
+    # Aynı dakika içindeki mesajlar localtime/tz lookup'ını tekrarlamaz
+    return _hhmm(int(time.time()) // 60)
+
+# _parse_price hot path'i: rakam, nokta ve virgül dışındaki her karakteri
+# (boşluk dahil) silen translate tablosu — regex sub + replace zincirinden
+# tek C geçişine iner. Latin-1 üstü karakterler fiyat hücresinde görülmez;
+# yine de görünürse int() zaten reddeder.
+_PRICE_KEEP = str.maketrans(
+    "", "", "".join(chr(c) for c in range(256) if chr(c) not in "0123456789.,")
+)
+
+# resolve_item_id'nin isim normalizasyonu için
+_WS_RE = re.compile(r'\s+')
+
+# Eşik fiyatındaki binlik ayraçlarını tek geçişte söker (iki ara string
+# üreten zincirleme .replace yerine)
+_STRIP_SEP = str.maketrans("", "", ".,")
+
+# on_message'ın "Item | 50000" formatı. [^|\n] sınıfı eski tembel .*?'nin
+# uzun mesajlarda yaptığı backtracking'i keser; uzunluk sınırları da
+# patolojik girdiyi baştan eler.
+_ALERT_RE = re.compile(r"\A([^|\n]{2,200}?)\s*\|\s*([\d.,]{1,15})\Z")
+
+# Fırsat bildirimi iki yerden (sweep + /checknow) aynı gövdeyle gidiyor;
+# şablon bir kez kurulur, alanlar hazır escape'li geçilir.
+_DEAL_TMPL = (
+    "🔥 <b>{kind}</b>\n\n"
+    "🎯 <b>Item:</b> {item}\n"
+    "💰 <b>Fiyat:</b> {price}g\n"
+    "🎯 <b>Eşiğin:</b> {threshold}g\n"
+    "🏪 <b>Satıcı:</b> {guild}\n"
+    "📍 <b>Lokasyon:</b> {loc}\n\n"
+    "⚡ Hemen satın almak için TTC'ye git!{extra}"
+)
+
+# on_cb'nin statik yardım ekranları: gövdeler runtime'da değişmiyor,
+# her tıklamada yeniden kurmak yerine bir kez render edilir.
+_SERVER_TEXT = "Avrupa (EU)" if TTC_REGION == "eu" else "Kuzey Amerika (NA)"
+
+_POPULAR_TEXT = (
+    "🔥 <b>Popüler ESO Itemleri</b>\n\n"
+    "💎 <b>Upgrade Materials:</b>\n"
+    "• Dreugh Wax (30.000-60.000g)\n"
+    "• Tempering Alloy (15.000-30.000g)\n"
+    "• Kuta (7.000-12.000g)\n"
+    "• Rosin (20.000-40.000g)\n\n"
+    "🧪 <b>Alchemy:</b>\n"
+    "• Cornflower (800-1.500g)\n"
+    "• Columbine (600-1.200g)\n"
+    "• Perfect Roe (100.000-200.000g)\n\n"
+    "⚔️ <b>Other:</b>\n"
+    "• Aetherial Dust (80.000-150.000g)\n"
+    "• Dragon Rheum (3.000-8.000g)\n\n"
+    "💡 Parantez içindeki fiyatlar ortalama aralık"
+)
+
+_HOWTO_TEXT = (
+    "📚 <b>Nasıl Kullanılır?</b>\n\n"
+    "1️⃣ <b>Alarm Ekle:</b>\n"
+    "<code>/add Dreugh Wax 45000</code>\n"
+    "Veya mesaj olarak: <code>Dreugh Wax | 45000</code>\n\n"
+    "2️⃣ <b>Bot Otomatik Çalışır:</b>\n"
+    "• Her 5 dakikada kontrol eder\n"
+    f"• {_SERVER_TEXT} serverından veri çeker\n"
+    "• Birim fiyatları takip eder\n\n"
+    "3️⃣ <b>Bildirim Alırsın:</b>\n"
+    "• Fiyat hedefin altına düştüğünde\n"
+    "• Hangi satıcıdan, nerede\n"
+    "• Direkt TTC linkiyle\n\n"
+    "4️⃣ <b>Yönetim:</b>\n"
+    "• <code>/list</code> - Alarmlarını gör\n"
+    "• <code>/test ItemAdı</code> - Anlık kontrol\n\n"
+    "🎯 Maksimum 15 alarm ekleyebilirsin!"
+)
+
+_TIPS_TEXT = (
+    "💡 <b>İpuçları ve Tavsiyeler</b>\n\n"
+    "🎯 <b>Fiyat Belirleme:</b>\n"
+    "• TTC'de ortalama fiyatı kontrol et\n"
+    "• %10-20 altında hedef belirle\n"
+    "• Çok düşük hedef koyma (bulunmaz)\n\n"
+    "📊 <b>Alarm Yönetimi:</b>\n"
+    "• En çok 10-12 alarm kullan\n"
+    "• Gereksizleri sil (/list)\n"
+    "• Popüler itemleri takip et\n\n"
+    "⚡ <b>Hızlı Kullanım:</b>\n"
+    "• Mesaj olarak gönder: <code>Kuta | 8000</code>\n"
+    "• /test ile anlık kontrol yap\n"
+    "• TTC linkine tıklayıp satın al\n\n"
+    "🔔 <b>Bildirimler:</b>\n"
+    "• Hemen satın al, çabuk tükenir\n"
+    "• Aynı item 10dk sonra tekrar kontrol edilir\n\n"
+    "❓ Sorun mu var? /help komutu kullan!"
+)
+
+_ADD_MORE_TEXT = (
+    "➕ <b>Yeni Alarm Ekle</b>\n\n"
+    "Şu yöntemlerden birini kullan:\n\n"
+    "🔸 <b>Komut ile:</b>\n"
+    "<code>/add ItemAdı HedefFiyat</code>\n"
+    "<i>Örnek: /add Kuta 8000</i>\n\n"
+    "🔸 <b>Mesaj ile:</b>\n"
+    "<code>ItemAdı | HedefFiyat</code>\n"
+    "<i>Örnek: Kuta | 8000</i>\n\n"
+    "💡 Item adını TTC'deki gibi İngilizce yaz\n"
+    "🎯 Fiyatı gold cinsinden yaz (8000, 50000...)"
+)
+
+_HELP_ADD_TEXT = (
+    "➕ <b>Alarm Ekleme Rehberi</b>\n\n"
+    "📝 <b>Doğru Format:</b>\n"
+    "• <code>/add Dreugh Wax 50000</code>\n"
+    "• <code>/add Kuta 8000</code>\n"
+    "• Mesaj: <code>Perfect Roe | 150000</code>\n\n"
+    "✅ <b>Kurallar:</b>\n"
+    "• Item adı İngilizce olmalı\n"
+    "• Fiyat sadece rakam (50000)\n"
+    "• Nokta/virgül kullanma\n"
+    "• Maksimum 15 alarm\n\n"
+    "🎯 <b>İpucu:</b>\n"
+    "TTC sitesinde item adını kontrol et,\n"
+    "aynı ismi kullan.\n\n"
+    "❓ Hala sorun mu var? /help yazın!"
+)
+
 # -------------------------
 # Database
 # -------------------------
 class Database:
     def __init__(self, path: str = "eso_price_tracker.db"):
         self.path = path
+        # Tek kalıcı bağlantı: her sorguda dosya açma/kapama maliyeti yok.
+        # WAL + synchronous=NORMAL yazarken okuyucuları bloklamaz ve commit
+        # başına fsync sayısını düşürür.
+        # cached_statements: aynı SQL metinleri tekrar parse edilmeden
+        # prepared-statement cache'inden gelir (sorgular literal sabitler).
+        self._con = sqlite3.connect(
+            self.path, check_same_thread=False, cached_statements=256
+        )
+        # Satırlar dict(zip(...)) ile kopyalanmak yerine sqlite3.Row olarak
+        # döner: anahtarla erişim C tarafında, satır başına dict kurulmaz.
+        self._con.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._con.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA busy_timeout=5000;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-20000;
+            PRAGMA mmap_size=67108864;
+            """
+        )
         self._init()
+        # Planlayıcı indeks istatistiklerini görsün (küçük db, maliyeti yok)
+        self._con.execute("ANALYZE")
+
+    # Şema değişince artır; _init sadece eski sürümlerde migration koşar.
+    SCHEMA_VERSION = 4
 
     def _init(self):
-        with sqlite3.connect(self.path) as con:
+        with self._lock:
+            con = self._con
+            ver = con.execute("PRAGMA user_version").fetchone()[0]
+            if ver >= self.SCHEMA_VERSION:
+                # Güncel şema: her boot'ta kolon problamak yerine tek PRAGMA.
+                return
             cur = con.cursor()
             cur.execute(
                 """
@@ -108,27 +309,100 @@ class Database:
                 )
                 """
             )
-            # --- migration: yeni kolonlar yoksa ekle ---
+            # --- migration (bir kez): user_version öncesi db'lerde kolonlar
+            # eksik olabilir, probla ve ekle ---
             cur.execute("PRAGMA table_info(alerts)")
             cols = {r[1] for r in cur.fetchall()}
             if "last_notified_price" not in cols:
                 cur.execute("ALTER TABLE alerts ADD COLUMN last_notified_price INTEGER")
             if "last_notified_at" not in cols:
                 cur.execute("ALTER TABLE alerts ADD COLUMN last_notified_at INTEGER DEFAULT 0")
-            con.commit()
-
-    def add(self, user_id: int, username: str, item: str, price: int):
-        with sqlite3.connect(self.path) as con:
-            con.execute(
-                "INSERT INTO alerts (user_id, username, item_name, threshold_price) VALUES (?,?,?,?)",
-                (user_id, username, item, price),
+            # --- indeksler: list_user/all_due tablo taraması yapmasın ---
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_alerts_active_user ON alerts(is_active, user_id)"
+            )
+            # v3: partial indeks — sadece aktif satırları tutar, daha küçük
+            cur.execute("DROP INDEX IF EXISTS idx_alerts_active")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_alerts_active "
+                "ON alerts(is_active) WHERE is_active=1"
+            )
+            # cmd_add'deki duplicate kontrolü için
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_alerts_item_lower ON alerts(LOWER(item_name))"
             )
+            # find_by_name: kullanıcı başına isimle tek satır lookup (v2)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_alerts_user_itemlower "
+                "ON alerts(user_id, LOWER(item_name))"
+            )
+            # v4: tekillik Python ön-kontrolünden DB'ye indi. Önce indeksin
+            # kurulabilmesi için mevcut mükerrer aktif kayıtlardan en yenisi
+            # bırakılır, sonra partial unique indeks eklenir — iki mesajın
+            # aynı anda aynı itemi eklediği TOCTOU yarışı burada kapanır.
+            cur.execute(
+                """UPDATE alerts SET is_active=0
+                   WHERE is_active=1 AND id NOT IN (
+                       SELECT MAX(id) FROM alerts WHERE is_active=1
+                       GROUP BY user_id, LOWER(item_name))"""
+            )
+            cur.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_alerts_user_item "
+                "ON alerts(user_id, LOWER(item_name)) WHERE is_active=1"
+            )
+            cur.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
             con.commit()
 
-    def list_user(self, user_id: int) -> List[Dict]:
-        with sqlite3.connect(self.path) as con:
-            cur = con.cursor()
-            cur.execute(
+    MAX_ALERTS = 15
+
+    def add_with_limit(
+        self, user_id: int, username: str, item: str, price: int
+    ) -> Tuple[str, Optional[int]]:
+        """Limit + tekillik + insert tek transaction'da.
+
+        Dönüş: ("ok", None) | ("limit", MAX_ALERTS) | ("dup", mevcut eşik).
+        Eskiden count_user + find_by_name + add üç ayrı round-trip'ti ve
+        aralarına giren ikinci mesaj yarış açabiliyordu; BEGIN IMMEDIATE
+        altında sayım ve insert atomik, tekillik de ux_alerts_user_item
+        indeksinden geliyor."""
+        with self._lock:
+            con = self._con
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                count = con.execute(
+                    "SELECT COUNT(*) FROM alerts WHERE user_id=? AND is_active=1",
+                    (user_id,),
+                ).fetchone()[0]
+                if count >= self.MAX_ALERTS:
+                    con.execute("ROLLBACK")
+                    return "limit", self.MAX_ALERTS
+                try:
+                    con.execute(
+                        "INSERT INTO alerts (user_id, username, item_name, threshold_price) VALUES (?,?,?,?)",
+                        (user_id, username, item, price),
+                    )
+                except sqlite3.IntegrityError:
+                    # Karşılaştırma indeksle aynı collation'da olmalı:
+                    # SQLite'ın LOWER'ı ASCII-only, Python'un .lower()'ı
+                    # Unicode — 'CAFÉ' gibi isimlerde ikisi ayrışır ve
+                    # lookup indeksin yakaladığı satırı ıskalar.
+                    row = con.execute(
+                        """SELECT threshold_price FROM alerts
+                           WHERE user_id=? AND is_active=1
+                             AND LOWER(item_name)=LOWER(?)""",
+                        (user_id, item),
+                    ).fetchone()
+                    con.execute("ROLLBACK")
+                    return "dup", row["threshold_price"] if row else None
+                con.execute("COMMIT")
+                return "ok", None
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    def list_user(self, user_id: int) -> List[sqlite3.Row]:
+        with self._lock:
+            cur = self._con.execute(
                  """SELECT id, item_name, threshold_price, current_price,
                           last_check, last_notified_price, last_notified_at
                    FROM alerts
@@ -136,48 +410,112 @@ class Database:
                    ORDER BY created_at DESC""",
                 (user_id,),
             )
-            cols = [d[0] for d in cur.description]
-            return [dict(zip(cols, r)) for r in cur.fetchall()]
-    def set_notified(self, alert_id: int, price: int):
-        with sqlite3.connect(self.path) as con:
-            con.execute(
-                "UPDATE alerts SET last_notified_price=?, last_notified_at=? WHERE id=?",
-                (price, now_ts(), alert_id),
+            return cur.fetchall()
+
+    def get_alert(self, alert_id: int, user_id: int) -> Optional[sqlite3.Row]:
+        # Tek satır PK lookup; list_user'ı çekip Python'da taramaya gerek yok
+        with self._lock:
+            cur = self._con.execute(
+                """SELECT id, item_name, threshold_price, current_price,
+                          last_check, last_notified_price, last_notified_at
+                   FROM alerts
+                   WHERE id=? AND user_id=? AND is_active=1""",
+                (alert_id, user_id),
             )
-            con.commit()
+            return cur.fetchone()
 
-    def all_active(self) -> List[Dict]:
-        with sqlite3.connect(self.path) as con:
-            cur = con.cursor()
-            cur.execute(
+    def all_due(self, cutoff: int) -> List[sqlite3.Row]:
+        """Cooldown'u dolmuş aktif alarmlar (last_check < cutoff).
+        Filtre SQL'de: cooldown'daki satırlar Python'a hiç taşınmaz."""
+        with self._lock:
+            cur = self._con.execute(
                 """SELECT id, user_id, username, item_name, threshold_price,
                           current_price, last_check, last_notified_price, last_notified_at
-                   FROM alerts WHERE is_active=1"""
+                   FROM alerts
+                   WHERE is_active=1 AND COALESCE(last_check, 0) < ?""",
+                (cutoff,),
             )
-            cols = [d[0] for d in cur.description]
-            return [dict(zip(cols, r)) for r in cur.fetchall()]
+            return cur.fetchall()
 
     def set_price(self, alert_id: int, price: int):
-        with sqlite3.connect(self.path) as con:
-            con.execute(
+        with self._lock:
+            self._con.execute(
                 "UPDATE alerts SET current_price=?, last_check=? WHERE id=?",
                 (price, now_ts(), alert_id),
             )
-            con.commit()
+            self._con.commit()
+
+    def bulk_set_price(self, rows: List[Tuple[int, int, int]]):
+        """Sweep sonunda toplu fiyat yazımı. rows: (price, ts, alert_id).
+        N ayrı commit/fsync yerine tek transaction."""
+        if not rows:
+            return
+        with self._lock:
+            self._con.executemany(
+                "UPDATE alerts SET current_price=?, last_check=? WHERE id=?", rows
+            )
+            self._con.commit()
+
+    def bulk_set_notified(self, rows: List[Tuple[int, int, int]]):
+        """Toplu bildirim kaydı. rows: (price, ts, alert_id)."""
+        if not rows:
+            return
+        with self._lock:
+            self._con.executemany(
+                "UPDATE alerts SET last_notified_price=?, last_notified_at=? WHERE id=?", rows
+            )
+            self._con.commit()
+
+    @staticmethod
+    def should_send(last_notified_price: Optional[int], current_price: int) -> bool:
+        """Bildirim kararı: ilk kez ya da önceki bildirimden daha düşükse gönder.
+        all_due() zaten last_notified_price döndürdüğü için ekstra SELECT yok."""
+        return last_notified_price is None or current_price < last_notified_price
 
     def deactivate(self, alert_id: int, user_id: int) -> bool:
-        with sqlite3.connect(self.path) as con:
-            cur = con.cursor()
-            cur.execute(
+        with self._lock:
+            cur = self._con.execute(
                 "UPDATE alerts SET is_active=0 WHERE id=? AND user_id=?",
                 (alert_id, user_id),
             )
-            con.commit()
+            self._con.commit()
             return cur.rowcount > 0
 
 # -------------------------
 # PriceResult + TTC
 # -------------------------
+_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+class AsyncTokenBucket:
+    """TTC host'u için token bucket. Rastgele sleep'lerin aksine upstream'e
+    giden ortalama hızı sabitler: boşta token birikir (burst), yük altında
+    istekler eşit aralıklarla sızar."""
+
+    def __init__(self, rate: float = TTC_REQ_RATE, capacity: int = TTC_REQ_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
 @dataclass
 class PriceResult:
     item_id: Optional[int]
@@ -188,36 +526,195 @@ class PriceResult:
     source: str  # "listing" | "fallback" | "captcha" | "error"
 
 class TTC:
+    # Havuzdaki hazır context sayısı; aynı anda en fazla bu kadar fetch koşar
+    POOL_SIZE = 4
+    # Aynı item için bu süre içinde gelen istekler tek scrape'i paylaşır.
+    # Bu taban TTL; fiyatı oynamayan itemler için gözlenen volatiliteye
+    # göre PRICE_TTL_MAX'a kadar uzar (bkz. _note_price).
+    PRICE_TTL = 60
+    PRICE_TTL_MAX = 600
+    # Captcha sonucu da kısaca cache'lenir: çözülene kadar her alarm için
+    # ayrı ayrı browser açmanın anlamı yok
+    CAPTCHA_TTL = 10
+
     def __init__(self, region: str = "us"):
         self.region = region
         self.base = f"https://{region}.tamrieltradecentre.com"
+        # Sabit query parçaları bir kez formatlanır; fetch başına sadece
+        # ItemID/isim eklenir.
+        self._search_url_tpl = (
+            f"{self.base}/pc/Trade/SearchResult"
+            "?TradeType=Sell&SortBy=Price&Order=asc&lang=en-US"
+        )
         self.item_index: Dict[str, int] = {}
 
-        # paylaşımlı playwright/browser (headless)
+        # paylaşımlı playwright/browser (headless) + context havuzu
         self.playwright = None
         self.browser = None
+        self._ctx_pool: Optional[asyncio.Queue] = None
+        self._init_lock = asyncio.Lock()
+
+        # Upstream'e giden scrape hızı tek yerden sınırlanır
+        self.bucket = AsyncTokenBucket()
+
+        # storage_state.json bir kez parse edilir; context başına disk okuması yok
+        self._storage_state_obj: Optional[Dict] = None
+
+        # TTL'li sonuç cache'i + anahtar başına kilit (eşzamanlı istekler
+        # N browser yerine tek scrape'te birleşir)
+        self._price_cache: Dict[str, Tuple[float, PriceResult]] = {}
+        self._fetch_locks: Dict[str, asyncio.Lock] = {}
+        # Item başına adaptif TTL: son 20 fiyatın varyasyon katsayısı düşükse
+        # cache ömrü uzar, oynak itemler taban TTL'de kalır
+        self._price_hist: Dict[str, deque] = {}
+        self._ttl: Dict[str, int] = {}
 
         try:
-            if ITEM_INDEX_JSON.exists():
-                obj = json.loads(ITEM_INDEX_JSON.read_text(encoding="utf-8"))
-                self.item_index = obj.get("map", {})
-                log.info(f"✅ {len(self.item_index)} item index yüklendi.")
+            if ITEM_INDEX_PKL.exists() and ITEM_INDEX_JSON.exists() and \
+                    ITEM_INDEX_PKL.stat().st_mtime >= ITEM_INDEX_JSON.stat().st_mtime:
+                # Hazır dict pickle'dan gelir; JSON reparse ~10x daha yavaş
+                self.item_index = pickle.loads(ITEM_INDEX_PKL.read_bytes())
+                log.info("✅ %d item index yüklendi (pkl).", len(self.item_index))
+            elif ITEM_INDEX_JSON.exists():
+                raw = ITEM_INDEX_JSON.read_bytes()
+                obj = orjson.loads(raw) if orjson is not None else json.loads(raw)
+                # Anahtarlar yüklerken bir kez normalize edilir (karışık
+                # büyük/küçük harfli indeks dosyaları da isabet etsin diye)
+                # ve intern'lenir; lookup'ta ekstra iş kalmaz.
+                self.item_index = {
+                    sys.intern(k.strip().lower()): int(v)
+                    for k, v in obj.get("map", {}).items()
+                }
+                log.info("✅ %d item index yüklendi.", len(self.item_index))
+                try:
+                    ITEM_INDEX_PKL.write_bytes(
+                        pickle.dumps(self.item_index, protocol=pickle.HIGHEST_PROTOCOL)
+                    )
+                except Exception as e:
+                    log.debug("Index pickle yazılamadı: %s", e)
             else:
                 log.info("ℹ️ Item index dosyası bulunamadı (devam).")
         except Exception as e:
             log.warning("Item index yüklenemedi: %s", e)
 
+        # Exact dict ıskalarsa devreye giren FTS5 fallback'i: yazım hatası /
+        # diyakritik farkı olan isimler pahalı geniş TTC aramasına düşmeden
+        # çözülür. FTS5 derlenmemişse sessizce devre dışı kalır.
+        self._fts: Optional[sqlite3.Connection] = None
+        if self.item_index:
+            try:
+                con = sqlite3.connect(ITEM_INDEX_DB, check_same_thread=False)
+                n = con.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE name='items_fts'"
+                ).fetchone()[0]
+                if not n or con.execute(
+                    "SELECT count(*) FROM items_fts"
+                ).fetchone()[0] != len(self.item_index):
+                    con.executescript(
+                        """
+                        DROP TABLE IF EXISTS items_fts;
+                        CREATE VIRTUAL TABLE items_fts USING fts5(
+                            name, item_id UNINDEXED,
+                            tokenize='unicode61 remove_diacritics 2');
+                        """
+                    )
+                    con.executemany(
+                        "INSERT INTO items_fts VALUES (?,?)",
+                        self.item_index.items(),
+                    )
+                    con.commit()
+                self._fts = con
+            except sqlite3.OperationalError as e:
+                log.debug("FTS5 indeksi kullanılamıyor: %s", e)
+
     async def init(self):
-        """Headless chromium tek sefer açılır ve reuse edilir."""
-        if not self.playwright:
-            self.playwright = await async_playwright().start()
-        if not self.browser:
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
+        """Headless chromium + context havuzu tek sefer açılır ve reuse edilir.
+
+        Kilit şart: soğuk başlangıçta sweep/checknow birden çok task'la aynı
+        anda buraya düşer; kontrol ile atama arasındaki await'ler yüzünden
+        kilitsiz hali birden fazla Chromium başlatıp hepsini öksüz bırakır."""
+        async with self._init_lock:
+            # Kilidi bekleyen task girdiğinde iş çoktan bitmiş olabilir
+            if not self.playwright:
+                self.playwright = await async_playwright().start()
+            if not self.browser:
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,
+                    executable_path=CHROME_SHELL_PATH or None,
+                    args=['--no-sandbox', '--disable-setuid-sandbox']
+                )
+            if self._ctx_pool is None:
+                pool = asyncio.Queue()
+                for _ in range(self.POOL_SIZE):
+                    await pool.put(await self._make_context())
+                self._ctx_pool = pool
+
+    # Scraper sadece tablo metnini okuyor; bunlar boşuna indiriliyor.
+    # Stylesheet bilerek bloklanmıyor: captcha/ad modal is_visible()
+    # kontrolleri CSS'e bağımlı.
+    BLOCKED_RESOURCES = {"image", "media", "font"}
+
+    @staticmethod
+    async def _route_filter(route):
+        req = route.request
+        if req.resource_type in TTC.BLOCKED_RESOURCES or \
+                "analytics" in req.url or "googlesyndication" in req.url or "doubleclick" in req.url:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _storage_state(self) -> Optional[Dict]:
+        """Parse edilmiş storage_state dict'ini döndürür (lazy + cache).
+
+        Playwright new_context'e dosya yolu verilince her çağrıda dosyayı
+        yeniden okuyup parse ediyor; dict doğrudan kabul edildiği için bir
+        kez parse'layıp cache'liyoruz. Captcha çözümünden sonra
+        refresh_contexts cache'i düşürür."""
+        if self._storage_state_obj is None and STORAGE_STATE.exists():
+            try:
+                self._storage_state_obj = json.loads(
+                    STORAGE_STATE.read_text(encoding="utf-8")
+                )
+            except Exception as e:
+                log.debug("storage_state okunamadı: %s", e)
+        return self._storage_state_obj
+
+    async def _make_context(self):
+        """storage_state ile tohumlanmış yeni bir headless context üretir."""
+        context = await self.browser.new_context(
+            storage_state=self._storage_state(),
+            user_agent=_USER_AGENT,
+            viewport={"width": 1280, "height": 800}
+        )
+        await context.route("**/*", self._route_filter)
+        return context
+
+    async def refresh_contexts(self):
+        """Havuzdaki boştaki context'leri güncel storage_state ile yeniler.
+        O an kullanımda olanlar işi bitince havuza eski halleriyle döner;
+        havuz boyutu değişmez."""
+        # Dosya captcha çözümünde yeniden yazıldı; cache'lenen dict bayat
+        self._storage_state_obj = None
+        if self._ctx_pool is None:
+            return
+        idle = []
+        while not self._ctx_pool.empty():
+            idle.append(self._ctx_pool.get_nowait())
+        for ctx in idle:
+            try:
+                await ctx.close()
+            except Exception as e:
+                log.debug("Context kapatılamadı: %s", e)
+            await self._ctx_pool.put(await self._make_context())
 
     async def shutdown(self):
+        if self._ctx_pool is not None:
+            while not self._ctx_pool.empty():
+                try:
+                    await (self._ctx_pool.get_nowait()).close()
+                except Exception as e:
+                    log.debug("Context kapatılamadı: %s", e)
+            self._ctx_pool = None
         if self.browser:
             await self.browser.close()
             self.browser = None
@@ -225,9 +722,24 @@ class TTC:
             await self.playwright.stop()
             self.playwright = None
 
-    async def resolve_item_id(self, item_name: str) -> Optional[int]:
-        key = re.sub(r'\s+', ' ', item_name).strip().lower()
-        return self.item_index.get(key)
+    def resolve_item_id(self, item_name: str) -> Optional[int]:
+        # Saf dict lookup; async olması coroutine allocation'dan başka bir
+        # şey kazandırmıyordu.
+        key = _WS_RE.sub(' ', item_name).strip().lower()
+        item_id = self.item_index.get(key)
+        if item_id is not None or self._fts is None or not key:
+            return item_id
+        # Exact isabet yok: FTS5'ten rank'e göre en iyi eşleşme
+        try:
+            q = " ".join(f'"{t}"' for t in key.replace('"', ' ').split())
+            row = self._fts.execute(
+                "SELECT item_id FROM items_fts WHERE items_fts MATCH ? "
+                "ORDER BY rank LIMIT 1",
+                (q,),
+            ).fetchone()
+            return row[0] if row else None
+        except sqlite3.OperationalError:
+            return None
 
     def _parse_price(self, price_text: str) -> Optional[int]:
         """Fiyat metnini sayıya çevirir - birim fiyatı alır."""
@@ -235,43 +747,32 @@ class TTC:
             if not price_text:
                 return None
             # TTC formatı: "1.000 \nX\n5\n=\n5.000" -> ilk satır birim fiyat
-            lines = [line.strip() for line in price_text.strip().split('\n') if line.strip()]
-            if not lines:
-                return None
-            unit_price_line = lines[0]
+            # (strip'li metnin ilk satırı; satır listesi kurmaya gerek yok)
+            unit_price_line = price_text.strip().split('\n', 1)[0]
 
-            # boşluklu binlik ayıracı vs. normalize et
-            clean_text = re.sub(r'[^\d\.,\s]', '', unit_price_line).replace(' ', '')
+            # Rakam/./, dışındaki her şey tek translate geçişinde atılır
+            clean_text = unit_price_line.translate(_PRICE_KEEP)
             if not clean_text:
                 return None
 
-            possible_prices = []
-            if '.' in clean_text and ',' not in clean_text:
-                if clean_text.count('.') == 1:
-                    parts = clean_text.split('.')
-                    if len(parts[1]) == 3:  # 1.000
-                        price_str = clean_text.replace('.', '')
-                        possible_prices.append(int(price_str))
-                    else:  # ondalık
-                        possible_prices.append(int(float(clean_text)))
-                else:
-                    price_str = clean_text.replace('.', '')
-                    possible_prices.append(int(price_str))
-            elif ',' in clean_text and '.' not in clean_text:
-                price_str = clean_text.replace(',', '')
-                possible_prices.append(int(price_str))
-            elif '.' in clean_text and ',' in clean_text:
-                price_str = clean_text.replace('.', '').replace(',', '.')
-                possible_prices.append(int(float(price_str)))
+            # Ayraç sayıları bir kez sayılır, tek dallanmayla çözülür
+            dots = clean_text.count('.')
+            commas = clean_text.count(',')
+            if dots and commas:
+                # Avrupa formatı: 1.500,25 -> nokta binlik, virgül ondalık
+                price = int(float(clean_text.replace('.', '').replace(',', '.')))
+            elif dots == 1 and len(clean_text.partition('.')[2]) != 3:
+                price = int(float(clean_text))  # ondalık (1.5)
+            elif dots:
+                price = int(clean_text.replace('.', ''))  # binlik (1.000)
+            elif commas:
+                price = int(clean_text.replace(',', ''))  # binlik (1,000)
             else:
-                possible_prices.append(int(clean_text))
+                price = int(clean_text)
 
-            for price in possible_prices:
-                if price > 0:
-                    return price
-            return None
+            return price if price > 0 else None
         except Exception as e:
-            log.warning(f"Fiyat parse hatası ('{price_text}'): {e}")
+            log.warning("Fiyat parse hatası ('%s'): %s", price_text, e)
             return None
 
     async def _new_context(self, headless: bool):
@@ -292,117 +793,189 @@ class TTC:
             browser = temp_browser
 
         context = await browser.new_context(
-            storage_state=str(STORAGE_STATE) if STORAGE_STATE.exists() else None,
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
+            storage_state=self._storage_state(),
+            user_agent=_USER_AGENT,
             viewport={"width": 1280, "height": 800}
         )
         return browser, context
 
     async def fetch_price(self, item_name: str, headless: bool = True) -> PriceResult:
-        await self.init()
-        item_id = await self.resolve_item_id(item_name)
-
-        base_url = f"{self.base}/pc/Trade/SearchResult?"
-        params = [
-            f"ItemNamePattern={quote(item_name)}",
-            "TradeType=Sell",
-            "SortBy=Price",
-            "Order=asc",
-            "lang=en-US",
-        ]
+        # Headful (/test, captcha çözümü) her zaman gerçek scrape yapar;
+        # cache sadece otomatik headless kontrolleri için.
+        if not headless:
+            return await self._fetch_price_uncached(item_name, headless=False)
+
+        key = item_name.strip().lower()
+        res = self._cache_get(key)
+        if res is not None:
+            return res
+
+        lock = self._fetch_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Kilidi beklerken başka task doldurmuş olabilir
+            res = self._cache_get(key)
+            if res is not None:
+                return res
+            res = await self._fetch_price_uncached(item_name, headless=True)
+            if res.source in ("listing", "captcha"):
+                self._price_cache[key] = (time.time(), res)
+                if res.source == "listing" and res.price:
+                    self._note_price(key, res.price)
+            return res
+
+    def _note_price(self, key: str, price: int) -> None:
+        """Fiyat geçmişini günceller ve item'ın cache TTL'ini uyarlar.
+
+        Stabil itemler (ör. Rosin) için her 60 sn'de scrape israf; oynak
+        itemler (ör. Perfect Roe) için 10 dk bayatlık kabul edilemez.
+        Son 20 fiyatın varyasyon katsayısına (stdev/mean) göre TTL,
+        PRICE_TTL..PRICE_TTL_MAX arasında ölçeklenir: cv=0 -> max,
+        cv>=0.5 -> taban."""
+        hist = self._price_hist.setdefault(key, deque(maxlen=20))
+        hist.append(price)
+        if len(hist) < 3:
+            return
+        mean = sum(hist) / len(hist)
+        cv = statistics.pstdev(hist) / mean if mean else 0.0
+        ttl = int(self.PRICE_TTL_MAX * (1 - min(cv, 0.5) * 2))
+        self._ttl[key] = max(self.PRICE_TTL, min(self.PRICE_TTL_MAX, ttl))
+
+    def _cache_get(self, key: str) -> Optional[PriceResult]:
+        hit = self._price_cache.get(key)
+        if not hit:
+            return None
+        if hit[1].source == "captcha":
+            ttl = self.CAPTCHA_TTL
+        else:
+            ttl = self._ttl.get(key, self.PRICE_TTL)
+        return hit[1] if time.time() - hit[0] < ttl else None
+
+    async def _fetch_price_uncached(self, item_name: str, headless: bool = True) -> PriceResult:
+        # Token burada, gerçek upstream trafiğinin hemen önünde yakılır;
+        # cache'ten dönen çağrılar hız sınırına hiç uğramaz.
+        await self.bucket.acquire()
+        item_id = self.resolve_item_id(item_name)
+
+        # ASCII ve URL'de özel anlamı olan karakter içermeyen isimlerde
+        # (item adlarının neredeyse tamamı) quote() gereksiz; boşlukları
+        # çevirmek yeterli.
+        if item_name.isascii() and not any(c in item_name for c in '&=?#%+'):
+            q = item_name.replace(" ", "+")
+        else:
+            q = quote(item_name)
+        url = f"{self._search_url_tpl}&ItemNamePattern={q}"
         if item_id:
-            params.insert(0, f"ItemID={item_id}")
-        url = base_url + "&".join(params)
+            url += f"&ItemID={item_id}"
 
         price, guild, loc, source = None, None, None, "fallback"
         context = None
         page = None
+        temp_browser = None
 
         try:
-            context = await self.browser.new_context(
-                storage_state=str(STORAGE_STATE) if STORAGE_STATE.exists() else None,
-                user_agent=(
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                ),
-                viewport={"width": 1280, "height": 800}
-            )
+            if headless:
+                await self.init()
+                # Havuzdan hazır context al; yeni context + storage_state
+                # yükleme maliyeti ödenmez, havuz doluysa sıra beklenir.
+                context = await self._ctx_pool.get()
+            else:
+                # captcha çözümü için geçici headful browser/context
+                temp_browser, context = await self._new_context(headless=False)
             page = await context.new_page()
 
             log.info("🌍 TTC açılıyor: %s", url)
             await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            await page.wait_for_timeout(2000)
 
-            # --- Ad blocker modal kontrolü ---
-            try:
-                ad_btn = await page.query_selector("text=Continue with first party ads")
-                if ad_btn:
-                    log.info("⚠️ Ad blocker modal bulundu, kapatılıyor...")
-                    await ad_btn.click()
-                    await page.wait_for_timeout(2000)
-                else:
-                    # alternatif kontrol
-                    await page.evaluate("""
-                        const modal = document.querySelector('.modal-dialog');
-                        if (modal) {
-                            const btn = modal.querySelector('button, .btn-primary');
-                            if (btn) btn.click();
-                        }
-                    """)
-            except Exception as e:
-                log.debug("Ad modal bulunamadı: %s", e)
+            # --- Modal/tablo yarışı ---
+            # Ad modal, captcha ve tablo sırayla problanmıyor; üçü tek
+            # wait_for_selector'da yarışır. Normal durumda (tablo var, modal
+            # yok) ilk eşleşen tbody olur ve hiç ekstra round-trip ödenmez.
+            handle = await page.wait_for_selector(
+                "#captcha-modal:visible, .modal-dialog:visible, "
+                "table.trade-list-table tbody",
+                timeout=20000,
+            )
+            kind = await handle.evaluate(
+                "el => el.id === 'captcha-modal' ? 'captcha'"
+                " : el.classList.contains('modal-dialog') ? 'ad' : 'table'"
+            )
 
-            # --- Captcha kontrolü ---
-            captcha_modal = await page.query_selector("#captcha-modal")
-            if captcha_modal and await captcha_modal.is_visible():
-                log.warning("⚠️ Captcha çıktı! Manuel çözüm gerekiyor.")
-                return PriceResult(item_id, None, None, None, url, "captcha")
+            if kind == "ad":
+                log.info("⚠️ Ad blocker modal bulundu, kapatılıyor...")
+                try:
+                    await page.evaluate("""() => {
+                        const modal = document.querySelector('.modal-dialog');
+                        if (!modal) return;
+                        const btns = modal.querySelectorAll('button, .btn-primary');
+                        const cont = Array.from(btns).find(
+                            b => b.textContent.includes('Continue with first party ads')
+                        );
+                        (cont || btns[0])?.click();
+                    }""")
+                    await page.wait_for_selector(".modal-dialog", state="hidden", timeout=5000)
+                except Exception as e:
+                    log.debug("Ad modal kapatılamadı: %s", e)
+
+            elif kind == "captcha":
+                if headless:
+                    log.warning("⚠️ Captcha çıktı! Manuel çözüm gerekiyor.")
+                    return PriceResult(item_id, None, None, None, url, "captcha")
+                # Headful: kullanıcı captcha'yı çözene kadar bekle, sonra
+                # storage_state'i kaydet ve havuzdaki context'leri tazele —
+                # playwright yeniden başlatılmaz, sıcak headless browser kalır.
+                log.warning("⚠️ Captcha çıktı, tarayıcıda çözülmesi bekleniyor...")
+                try:
+                    await page.wait_for_selector("#captcha-modal", state="hidden", timeout=180000)
+                    await context.storage_state(path=str(STORAGE_STATE))
+                    await self.refresh_contexts()
+                    log.info("✅ Captcha çözüldü, storage_state güncellendi.")
+                except Exception as e:
+                    log.warning("Captcha çözümü beklenemedi: %s", e)
+                    return PriceResult(item_id, None, None, None, url, "captcha")
 
             # --- Tablo bekle ---
             await page.wait_for_selector("table.trade-list-table tbody", timeout=20000)
-            rows = await page.query_selector_all("table.trade-list-table tbody tr.cursor-pointer")
 
-            if not rows:
+            # İlk 15 satır tek bir evaluate ile çekilir: satır/hücre başına
+            # ~50 IPC round-trip yerine browser tarafında bir DOM taraması.
+            rows_data = await page.evaluate(
+                """() => Array.from(
+                        document.querySelectorAll('table.trade-list-table tbody tr.cursor-pointer')
+                    ).slice(0, 15).map(tr => {
+                        const tds = tr.querySelectorAll('td');
+                        const priceCell = tr.querySelector('td.gold-amount.bold')
+                            || tr.querySelector("td[class*='gold-amount']")
+                            || tds[3];
+                        return {
+                            price: priceCell ? priceCell.innerText : '',
+                            guild: tds.length > 1 ? tds[1].innerText : '',
+                            loc: tds.length > 2 ? tds[2].innerText : ''
+                        };
+                    })"""
+            )
+
+            if not rows_data:
                 log.warning("Hiç ürün satırı bulunamadı: %s", item_name)
             else:
                 lowest_price = None
-                best_row = None
-
-                # ilk 15 satırı tara
-                for i, row in enumerate(rows[:15]):
-                    try:
-                        price_cell = await row.query_selector("td.gold-amount.bold") or \
-                                     await row.query_selector("td[class*='gold-amount']") or \
-                                     await row.query_selector("td:nth-child(4)")
-                        if price_cell:
-                            price_text = await price_cell.inner_text()
-                            current_price = self._parse_price(price_text)
-                            if current_price and current_price > 0:
-                                if lowest_price is None or current_price < lowest_price:
-                                    lowest_price = current_price
-                                    best_row = row
-                    except Exception as e:
-                        log.debug(f"Satır {i+1} işlenirken hata: {e}")
-                        continue
-
-                if best_row and lowest_price:
+                best = None
+
+                # URL SortBy=Price&Order=asc ile geliyor: parse edilebilen ilk
+                # satır zaten en düşük fiyat. Kalan 14 satır sadece ilk hücre
+                # bozuksa devreye giren yedek.
+                for rd in rows_data:
+                    current_price = self._parse_price(rd["price"])
+                    if current_price and current_price > 0:
+                        lowest_price = current_price
+                        best = rd
+                        break
+
+                if best and lowest_price:
                     price = lowest_price
                     source = "listing"
-                    try:
-                        cells = await best_row.query_selector_all("td")
-                        if len(cells) >= 3:
-                            guild = (await cells[1].inner_text()).strip()
-                            loc = (await cells[2].inner_text()).strip()
-                        log.info("✅ En düşük fiyat bulundu: %s = %dg", item_name, price)
-                    except Exception as e:
-                        log.warning("Guild/location çekilemedi: %s", e)
-                        guild = guild or "Bilinmiyor"
-                        loc = loc or "Bilinmiyor"
+                    guild = (best["guild"] or "").strip() or "Bilinmiyor"
+                    loc = (best["loc"] or "").strip() or "Bilinmiyor"
+                    log.info("✅ En düşük fiyat bulundu: %s = %dg", item_name, price)
 
         except Exception as e:
             log.error("fetch_price genel hatası: %s", e)
@@ -412,14 +985,54 @@ class TTC:
             try:
                 if page:
                     await page.close()
-                if context:
-                    await context.close()
             except Exception as e:
                 log.warning("Cleanup hatası: %s", e)
+            if headless:
+                # Context kapatılmaz, havuza geri döner
+                if context is not None:
+                    self._ctx_pool.put_nowait(context)
+            else:
+                try:
+                    if context:
+                        await context.close()
+                    if temp_browser:
+                        await temp_browser.close()
+                except Exception as e:
+                    log.warning("Cleanup hatası: %s", e)
 
         return PriceResult(item_id, price, guild, loc, url, source)
 
 
+# -------------------------
+# Telegram sender (rate limit)
+# -------------------------
+class TelegramSender:
+    """Giden mesajları global ~30 msg/s bot limitine uyacak şekilde sızdırır.
+
+    Sweep bildirimleri burst halinde gelir; leaky-bucket aralığı + 429
+    retry_after bekleyişi flood-wait hatalarını ve kuyruktaki gecikme
+    patlamalarını önler.
+    """
+    RATE = 30  # Telegram bot başına msg/s limiti
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._last_send = 0.0
+
+    async def send(self, func, *args, **kwargs):
+        async with self._lock:
+            wait = self._last_send + 1.0 / self.RATE - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await func(*args, **kwargs)
+            except RetryAfter as e:
+                log.warning("Telegram flood-wait: %ss bekleniyor", e.retry_after)
+                await asyncio.sleep(e.retry_after + 0.5)
+                return await func(*args, **kwargs)
+            finally:
+                self._last_send = time.monotonic()
+
 # -------------------------
 # Bot
 # -------------------------
@@ -429,26 +1042,28 @@ class Bot:
     def __init__(self):
         self.db = Database()
         self.ttc = TTC(TTC_REGION)
+        self.sender = TelegramSender()
 
     def _server_text(self) -> str:
-        return "Avrupa (EU)" if TTC_REGION == "eu" else "Kuzey Amerika (NA)"
+        return _SERVER_TEXT
+
+    @staticmethod
+    def _ago_text(last_check: int, now: int) -> str:
+        """'5 dakika önce' tarzı göreli zaman metni (kart ve kompakt liste ortak)."""
+        if not last_check:
+            return "henüz kontrol edilmedi"
+        diff = now - last_check
+        if diff < 60:
+            return "az önce"
+        if diff < 3600:
+            return f"{diff // 60} dakika önce"
+        return f"{diff // 3600} saat önce"
 
     def _alert_card(self, a: Dict) -> Tuple[str, InlineKeyboardMarkup]:
-        # Son kontrol zamanını hesapla
-        last_check = a.get("last_check", 0)
-        if last_check:
-            time_diff = int(time.time()) - last_check
-            if time_diff < 60:
-                time_str = "az önce"
-            elif time_diff < 3600:
-                time_str = f"{time_diff // 60} dakika önce"
-            else:
-                time_str = f"{time_diff // 3600} saat önce"
-        else:
-            time_str = "henüz kontrol edilmedi"
+        time_str = self._ago_text(a["last_check"] or 0, int(time.time()))
 
         # Durum analizi
-        current_price = a.get("current_price", 0)
+        current_price = a["current_price"] or 0
         threshold = a["threshold_price"]
 
         if current_price and current_price <= threshold:
@@ -479,7 +1094,7 @@ class Bot:
             body += "💰 <b>Son fiyat:</b> <i>henüz sorgulanmadı</i>\n"
 
         # 🔔 son bildirilen fiyat ekle
-        last_notified = a.get("last_notified_price")
+        last_notified = a["last_notified_price"]
         if last_notified:
             body += f"🔔 <b>Son bildirilen:</b> {fmt_gold(last_notified)}g\n"
 
@@ -495,6 +1110,23 @@ class Bot:
 
         return title + body, kb
 
+    def _alert_card_compact(self, a: Dict, now: int) -> str:
+        """Tek mesajlık liste görünümü için 2 satırlık kart (butonsuz)."""
+        current_price = a["current_price"] or 0
+        threshold = a["threshold_price"]
+        if current_price and current_price <= threshold:
+            emoji = "🔥"
+        elif current_price:
+            diff_percent = ((current_price - threshold) / threshold) * 100
+            emoji = "⚡" if diff_percent <= 20 else "📊"
+        else:
+            emoji = "❓"
+        price_str = f"{fmt_gold(current_price)}g" if current_price else "—"
+        return (
+            f"{emoji} <b>{esc_html(a['item_name'])}</b>\n"
+            f"🎯 {fmt_gold(threshold)}g · 💰 {price_str} · "
+            f"⏱ {self._ago_text(a['last_check'] or 0, now)}"
+        )
 
     async def cmd_start(self, u: Update, c: ContextTypes.DEFAULT_TYPE):
         user_name = u.effective_user.first_name or u.effective_user.username or "Tamriel'li"
@@ -570,7 +1202,7 @@ class Bot:
             return await u.message.reply_html("❌ Item adı en az 2 karakter olmalı!")
 
         try:
-            thr = int(str(price).replace(".", "").replace(",", ""))
+            thr = int(str(price).translate(_STRIP_SEP))
             if thr <= 0:
                 return await u.message.reply_html("❌ Fiyat 0'dan büyük olmalı!")
         except Exception:
@@ -581,25 +1213,22 @@ class Bot:
                 "💡 Sadece rakam kullan (50000, 150000 gibi)"
             )
 
-        # Kullanıcının alarm sayısını kontrol et
-        existing_alerts = self.db.list_user(u.effective_user.id)
-        if len(existing_alerts) >= 15:
+        # Limit + tekillik + insert tek DB round-trip'inde
+        status, val = self.db.add_with_limit(
+            u.effective_user.id, u.effective_user.username or "", item, thr
+        )
+        if status == "limit":
             return await u.message.reply_html(
-                "⚠️ En fazla 15 alarm ekleyebilirsin!\n\n"
+                f"⚠️ En fazla {val} alarm ekleyebilirsin!\n\n"
                 "🗑️ Önce bazı alarmları sil: <code>/list</code>\n\n"
                 "💡 Çok alarm eklemek yerine önemli olanları seç!"
             )
-
-        # Aynı item kontrolü
-        for alert in existing_alerts:
-            if alert['item_name'].lower() == item.lower():
-                return await u.message.reply_html(
-                    f"⚠️ <b>{esc_html(item)}</b> için zaten alarm var!\n\n"
-                    f"📊 Mevcut eşik: <b>{fmt_gold(alert['threshold_price'])}g</b>\n\n"
-                    "💡 Önce eskisini sil: <code>/list</code>"
-                )
-
-        self.db.add(u.effective_user.id, u.effective_user.username or "", item, thr)
+        if status == "dup":
+            return await u.message.reply_html(
+                f"⚠️ <b>{esc_html(item)}</b> için zaten alarm var!\n\n"
+                f"📊 Mevcut eşik: <b>{fmt_gold(val)}g</b>\n\n"
+                "💡 Önce eskisini sil: <code>/list</code>"
+            )
 
         success_text = (
             "✅ <b>Alarm başarıyla eklendi!</b>\n\n"
@@ -619,6 +1248,19 @@ class Bot:
 
         await u.message.reply_html(success_text, reply_markup=kb)
 
+    def _render_list(self, user_id: int) -> Tuple[Optional[str], List[Tuple[str, InlineKeyboardMarkup]]]:
+        """Liste çıktısını üretir: (header, kartlar). Alarm yoksa (None, []).
+        Komut da list_alerts callback'i de aynı render'ı kullanır; callback
+        için sahte Update kurmaya gerek kalmaz."""
+        arr = self.db.list_user(user_id)
+        if not arr:
+            return None, []
+        header = (
+            f"📋 <b>Alarmların ({len(arr)} adet)</b>\n\n"
+            "Her alarm için en son kontrol edilen fiyat gösteriliyor:"
+        )
+        return header, [self._alert_card(a) for a in arr]
+
     async def cmd_list(self, u: Update, c: ContextTypes.DEFAULT_TYPE):
         arr = self.db.list_user(u.effective_user.id)
         if not arr:
@@ -633,15 +1275,29 @@ class Bot:
             ])
             return await u.message.reply_html(text, reply_markup=kb)
 
-        header_text = (
-            f"📋 <b>Alarmların ({len(arr)} adet)</b>\n\n"
-            "Her alarm için en son kontrol edilen fiyat gösteriliyor:"
-        )
-        await u.message.reply_html(header_text)
-
+        # Kompakt görünüm: alarm başına ayrı mesaj yerine tek mesaj
+        # (N round-trip -> 1). Butonlu kart görünümü callback'ten açılır.
+        now = int(time.time())
+        header = f"📋 <b>Alarmların ({len(arr)} adet)</b>"
+        kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🗂 Kart Görünümü", callback_data="list_alerts")]
+        ])
+        chunks: List[str] = []
+        cur = header
         for a in arr:
-            msg, kb = self._alert_card(a)
-            await u.message.reply_html(msg, reply_markup=kb)
+            line = self._alert_card_compact(a, now)
+            # Telegram 4096 sınırı: taşacaksa yeni mesaja geç
+            if len(cur) + len(line) + 2 > 4000:
+                chunks.append(cur)
+                cur = line
+            else:
+                cur = f"{cur}\n\n{line}"
+        chunks.append(cur)
+        for i, chunk in enumerate(chunks):
+            await self.sender.send(
+                u.message.reply_html, chunk,
+                reply_markup=kb if i == len(chunks) - 1 else None,
+            )
 
     async def cmd_test(self, u: Update, c: ContextTypes.DEFAULT_TYPE):
         if not c.args:
@@ -694,7 +1350,7 @@ class Bot:
                 price_line = "💰 <i>Fiyat bulunamadı</i>"
                 debug_info = f"\n🔧 <i>Debug: Fiyat parse edilemedi veya bulunamadı</i>"
 
-            time_str = time.strftime("%H:%M", time.localtime())
+            time_str = now_hhmm()
 
             text = (
                 f"{status_emoji} <b>Fiyat Kontrolü</b>\n\n"
@@ -719,11 +1375,11 @@ class Bot:
                 await loading_msg.delete()
             except:
                 pass
-            log.error(f"Test komutu hatası: {e}")
+            log.error("Test komutu hatası: %s", e)
             await u.message.reply_html(
                 f"❌ <b>Hata oluştu!</b>\n\n"
                 f"🎯 <b>Item:</b> {esc_html(item)}\n"
-                f"🔧 <b>Hata:</b> {esc_html(str(e)[:100])}\n\n"
+                f"🔧 <b>Hata:</b> {_fmt_err(e)}\n\n"
                 "💡 Tekrar deneyin veya item adını kontrol edin."
             )
 
@@ -743,45 +1399,70 @@ class Bot:
         checked_count = 0
         found_deals = 0
 
-        try:
-            for alert in user_alerts:
-                try:
-                    await asyncio.sleep(random.uniform(1, 3))
+        # Fetch'ler havuz boyutuyla sınırlı paralel koşar; job sweep'iyle
+        # aynı desen. DB yazımları sonda tek transaction'da gider.
+        sem = asyncio.Semaphore(TTC.POOL_SIZE)
+        price_updates: List[Tuple[int, int, int]] = []
+
+        async def check_one(alert: Dict):
+            nonlocal checked_count, found_deals
+            try:
+                # Hız sınırı fetch_price'ın içinde, sadece gerçek scrape'te
+                async with sem:
                     res = await self.ttc.fetch_price(alert["item_name"], headless=True)
-                    checked_count += 1
+                checked_count += 1
 
-                    if res.price is not None:
-                        self.db.set_price(alert["id"], res.price)
-
-                    if res.price is not None and res.price <= alert["threshold_price"]:
-                        found_deals += 1
-                        deal_text = (
-                            "🔥 <b>SÜPER FIRSAT BULDU!</b>\n\n"
-                            f"🎯 <b>Item:</b> {esc_html(alert['item_name'])}\n"
-                            f"💰 <b>Fiyat:</b> {fmt_gold(res.price)}g\n"
-                            f"🎯 <b>Eşiğin:</b> {fmt_gold(alert['threshold_price'])}g\n"
-                            f"🏪 <b>Satıcı:</b> {esc_html(res.guild or 'Bilinmiyor')}\n"
-                            f"📍 <b>Lokasyon:</b> {esc_html(res.location or 'Bilinmiyor')}\n\n"
-                            "⚡ Hemen satın almak için TTC'ye git!"
-                        )
-
-                        kb = InlineKeyboardMarkup([
-                            [InlineKeyboardButton("🔗 TTC'de Satın Al", url=res.link)]
-                        ])
-
-                        await u.message.reply_html(deal_text, reply_markup=kb)
-
-                    if checked_count % 3 == 0:
-                        await status_msg.edit_text(
-                            f"🔄 <b>İlerleme:</b> {checked_count}/{len(user_alerts)}\n\n"
-                            f"✅ Kontrol edilen: {checked_count}\n"
-                            f"🔥 Bulunan fırsat: {found_deals}\n\n"
-                            "⏳ Devam ediyor..."
-                        )
+                if res.price is not None:
+                    price_updates.append((res.price, now_ts(), alert["id"]))
+
+                if res.price is not None and res.price <= alert["threshold_price"]:
+                    found_deals += 1
+                    deal_text = _DEAL_TMPL.format(
+                        kind="SÜPER FIRSAT BULDU!",
+                        item=esc_html(alert['item_name']),
+                        price=fmt_gold(res.price),
+                        threshold=fmt_gold(alert['threshold_price']),
+                        guild=esc_html(res.guild or 'Bilinmiyor'),
+                        loc=esc_html(res.location or 'Bilinmiyor'),
+                        extra="",
+                    )
 
-                except Exception as e:
-                    log.warning(f"Manuel kontrol hatası ({alert['item_name']}): {e}")
+                    kb = InlineKeyboardMarkup([
+                        [InlineKeyboardButton("🔗 TTC'de Satın Al", url=res.link)]
+                    ])
+
+                    await self.sender.send(u.message.reply_html, deal_text, reply_markup=kb)
+
+            except Exception as e:
+                log.warning("Manuel kontrol hatası (%s): %s", alert["item_name"], e)
+
+        async def update_status():
+            # İlerleme, sonuç başına edit yerine 2 sn'de bir örneklenir;
+            # aynı sayıyı tekrar göndermez.
+            last = -1
+            while True:
+                await asyncio.sleep(2)
+                if checked_count == last:
                     continue
+                last = checked_count
+                try:
+                    await status_msg.edit_text(
+                        f"🔄 <b>İlerleme:</b> {checked_count}/{len(user_alerts)}\n\n"
+                        f"✅ Kontrol edilen: {checked_count}\n"
+                        f"🔥 Bulunan fırsat: {found_deals}\n\n"
+                        "⏳ Devam ediyor...",
+                        parse_mode=ParseMode.HTML,
+                    )
+                except Exception as e:
+                    log.debug("İlerleme mesajı güncellenemedi: %s", e)
+
+        try:
+            updater = asyncio.create_task(update_status())
+            try:
+                await asyncio.gather(*(check_one(a) for a in user_alerts))
+            finally:
+                updater.cancel()
+            self.db.bulk_set_price(price_updates)
 
             final_text = (
                 "✅ <b>Manuel Kontrol Tamamlandı!</b>\n\n"
@@ -797,7 +1478,7 @@ class Bot:
         except Exception as e:
             await status_msg.edit_text(
                 f"❌ <b>Kontrol sırasında hata oluştu!</b>\n\n"
-                f"🔧 Hata: {esc_html(str(e)[:100])}\n"
+                f"🔧 Hata: {_fmt_err(e)}\n"
                 f"📊 Kontrol edilen: {checked_count}/{len(user_alerts)}"
             )
 
@@ -821,52 +1502,52 @@ class Bot:
 
         elif data.startswith("check_"):
             alert_id = int(data.split("_")[1])
-            for a in self.db.list_user(q.from_user.id):
-                if a["id"] == alert_id:
-                    await q.edit_message_text(
-                        f"🔍 <b>{esc_html(a['item_name'])}</b> kontrol ediliyor...\n\n"
-                        "⏳ Bu işlem 10-30 saniye sürebilir\n"
-                        f"🌍 {self._server_text()} serverından fiyat çekiliyor..."
+            a = self.db.get_alert(alert_id, q.from_user.id)
+            if a:
+                await q.edit_message_text(
+                    f"🔍 <b>{esc_html(a['item_name'])}</b> kontrol ediliyor...\n\n"
+                    "⏳ Bu işlem 10-30 saniye sürebilir\n"
+                    f"🌍 {self._server_text()} serverından fiyat çekiliyor..."
+                )
+
+                try:
+                    res = await self.ttc.fetch_price(a["item_name"], headless=True)
+
+                    if res.price is not None:
+                        self.db.set_price(alert_id, res.price)
+
+                    time_str = now_hhmm()
+
+                    if res.price:
+                        price_line = f"💰 <b>{fmt_gold(res.price)}g</b> (birim fiyat)"
+                        if res.price <= a["threshold_price"]:
+                            price_line += "\n🔥 <b>HEDEF FİYATIN ALTINDA!</b>"
+                    else:
+                        price_line = "💰 <i>Fiyat alınamadı</i>"
+
+                    result_text = (
+                        f"📊 <b>{esc_html(a['item_name'])} - Anlık Kontrol</b>\n\n"
+                        f"{price_line}\n"
+                        f"🎯 <b>Hedef fiyat:</b> {fmt_gold(a['threshold_price'])}g\n"
+                        f"🏪 <b>Satıcı:</b> {esc_html(res.guild or 'Bilinmiyor')}\n"
+                        f"⏰ <b>Kontrol zamanı:</b> {time_str}\n"
+                        f"🌍 <b>Server:</b> {self._server_text()}"
                     )
 
-                    try:
-                        res = await self.ttc.fetch_price(a["item_name"], headless=True)
-
-                        if res.price is not None:
-                            self.db.set_price(alert_id, res.price)
-
-                        time_str = time.strftime("%H:%M", time.localtime())
-
-                        if res.price:
-                            price_line = f"💰 <b>{fmt_gold(res.price)}g</b> (birim fiyat)"
-                            if res.price <= a["threshold_price"]:
-                                price_line += "\n🔥 <b>HEDEF FİYATIN ALTINDA!</b>"
-                        else:
-                            price_line = "💰 <i>Fiyat alınamadı</i>"
-
-                        result_text = (
-                            f"📊 <b>{esc_html(a['item_name'])} - Anlık Kontrol</b>\n\n"
-                            f"{price_line}\n"
-                            f"🎯 <b>Hedef fiyat:</b> {fmt_gold(a['threshold_price'])}g\n"
-                            f"🏪 <b>Satıcı:</b> {esc_html(res.guild or 'Bilinmiyor')}\n"
-                            f"⏰ <b>Kontrol zamanı:</b> {time_str}\n"
-                            f"🌍 <b>Server:</b> {self._server_text()}"
-                        )
-
-                        kb = InlineKeyboardMarkup([
-                            [InlineKeyboardButton("🔗 TTC'de Görüntüle", url=res.link)],
-                            [InlineKeyboardButton("🔄 Tekrar Kontrol", callback_data=f"check_{alert_id}")]
-                        ])
-
-                        return await q.edit_message_text(result_text, reply_markup=kb)
-
-                    except Exception as e:
-                        return await q.edit_message_text(
-                            f"❌ <b>Kontrol hatası!</b>\n\n"
-                            f"🎯 <b>Item:</b> {esc_html(a['item_name'])}\n"
-                            f"🔧 <b>Sorun:</b> {esc_html(str(e)[:50])}...\n\n"
-                            "💡 Tekrar dene veya /test komutu kullan"
-                        )
+                    kb = InlineKeyboardMarkup([
+                        [InlineKeyboardButton("🔗 TTC'de Görüntüle", url=res.link)],
+                        [InlineKeyboardButton("🔄 Tekrar Kontrol", callback_data=f"check_{alert_id}")]
+                    ])
+
+                    return await q.edit_message_text(result_text, reply_markup=kb)
+
+                except Exception as e:
+                    return await q.edit_message_text(
+                        f"❌ <b>Kontrol hatası!</b>\n\n"
+                        f"🎯 <b>Item:</b> {esc_html(a['item_name'])}\n"
+                        f"🔧 <b>Sorun:</b> {_fmt_err(e, 50)}...\n\n"
+                        "💡 Tekrar dene veya /test komutu kullan"
+                    )
 
         elif data.startswith("test_"):
             item = data.split("test_", 1)[1]
@@ -885,98 +1566,32 @@ class Bot:
             )
 
         elif data == "list_alerts":
-            await self.cmd_list(Update(update_id=0, message=q.message), c)
+            # Not: eski sahte Update(message=q.message) yolu listeyi bot'un
+            # user_id'siyle sorguluyordu; doğrusu tıklayan kullanıcı.
+            header, cards = self._render_list(q.from_user.id)
+            if header is None:
+                return await q.edit_message_text(
+                    "📭 Hiç alarm yok! <code>/add ItemAdı Fiyat</code> ile ekle.",
+                    parse_mode=ParseMode.HTML,
+                )
+            await q.edit_message_text(header, parse_mode=ParseMode.HTML)
+            for msg, kb in cards:
+                await self.sender.send(q.message.reply_html, msg, reply_markup=kb)
 
         elif data == "popular_items":
-            await q.edit_message_text(
-                "🔥 <b>Popüler ESO Itemleri</b>\n\n"
-                "💎 <b>Upgrade Materials:</b>\n"
-                "• Dreugh Wax (30.000-60.000g)\n"
-                "• Tempering Alloy (15.000-30.000g)\n"
-                "• Kuta (7.000-12.000g)\n"
-                "• Rosin (20.000-40.000g)\n\n"
-                "🧪 <b>Alchemy:</b>\n"
-                "• Cornflower (800-1.500g)\n"
-                "• Columbine (600-1.200g)\n"
-                "• Perfect Roe (100.000-200.000g)\n\n"
-                "⚔️ <b>Other:</b>\n"
-                "• Aetherial Dust (80.000-150.000g)\n"
-                "• Dragon Rheum (3.000-8.000g)\n\n"
-                "💡 Parantez içindeki fiyatlar ortalama aralık"
-            )
+            await q.edit_message_text(_POPULAR_TEXT)
 
         elif data == "how_to_use":
-            await q.edit_message_text(
-                "📚 <b>Nasıl Kullanılır?</b>\n\n"
-                "1️⃣ <b>Alarm Ekle:</b>\n"
-                "<code>/add Dreugh Wax 45000</code>\n"
-                "Veya mesaj olarak: <code>Dreugh Wax | 45000</code>\n\n"
-                "2️⃣ <b>Bot Otomatik Çalışır:</b>\n"
-                "• Her 5 dakikada kontrol eder\n"
-                f"• {self._server_text()} serverından veri çeker\n"
-                "• Birim fiyatları takip eder\n\n"
-                "3️⃣ <b>Bildirim Alırsın:</b>\n"
-                "• Fiyat hedefin altına düştüğünde\n"
-                "• Hangi satıcıdan, nerede\n"
-                "• Direkt TTC linkiyle\n\n"
-                "4️⃣ <b>Yönetim:</b>\n"
-                "• <code>/list</code> - Alarmlarını gör\n"
-                "• <code>/test ItemAdı</code> - Anlık kontrol\n\n"
-                "🎯 Maksimum 15 alarm ekleyebilirsin!"
-            )
+            await q.edit_message_text(_HOWTO_TEXT)
 
         elif data == "tips":
-            await q.edit_message_text(
-                "💡 <b>İpuçları ve Tavsiyeler</b>\n\n"
-                "🎯 <b>Fiyat Belirleme:</b>\n"
-                "• TTC'de ortalama fiyatı kontrol et\n"
-                "• %10-20 altında hedef belirle\n"
-                "• Çok düşük hedef koyma (bulunmaz)\n\n"
-                "📊 <b>Alarm Yönetimi:</b>\n"
-                "• En çok 10-12 alarm kullan\n"
-                "• Gereksizleri sil (/list)\n"
-                "• Popüler itemleri takip et\n\n"
-                "⚡ <b>Hızlı Kullanım:</b>\n"
-                "• Mesaj olarak gönder: <code>Kuta | 8000</code>\n"
-                "• /test ile anlık kontrol yap\n"
-                "• TTC linkine tıklayıp satın al\n\n"
-                "🔔 <b>Bildirimler:</b>\n"
-                "• Hemen satın al, çabuk tükenir\n"
-                "• Aynı item 10dk sonra tekrar kontrol edilir\n\n"
-                "❓ Sorun mu var? /help komutu kullan!"
-            )
+            await q.edit_message_text(_TIPS_TEXT)
 
         elif data == "add_more":
-            await q.edit_message_text(
-                "➕ <b>Yeni Alarm Ekle</b>\n\n"
-                "Şu yöntemlerden birini kullan:\n\n"
-                "🔸 <b>Komut ile:</b>\n"
-                "<code>/add ItemAdı HedefFiyat</code>\n"
-                "<i>Örnek: /add Kuta 8000</i>\n\n"
-                "🔸 <b>Mesaj ile:</b>\n"
-                "<code>ItemAdı | HedefFiyat</code>\n"
-                "<i>Örnek: Kuta | 8000</i>\n\n"
-                "💡 Item adını TTC'deki gibi İngilizce yaz\n"
-                "🎯 Fiyatı gold cinsinden yaz (8000, 50000...)"
-            )
+            await q.edit_message_text(_ADD_MORE_TEXT)
 
         elif data == "help_add":
-            await q.edit_message_text(
-                "➕ <b>Alarm Ekleme Rehberi</b>\n\n"
-                "📝 <b>Doğru Format:</b>\n"
-                "• <code>/add Dreugh Wax 50000</code>\n"
-                "• <code>/add Kuta 8000</code>\n"
-                "• Mesaj: <code>Perfect Roe | 150000</code>\n\n"
-                "✅ <b>Kurallar:</b>\n"
-                "• Item adı İngilizce olmalı\n"
-                "• Fiyat sadece rakam (50000)\n"
-                "• Nokta/virgül kullanma\n"
-                "• Maksimum 15 alarm\n\n"
-                "🎯 <b>İpucu:</b>\n"
-                "TTC sitesinde item adını kontrol et,\n"
-                "aynı ismi kullan.\n\n"
-                "❓ Hala sorun mu var? /help yazın!"
-            )
+            await q.edit_message_text(_HELP_ADD_TEXT)
 
     async def cmd_test_callback(self, query, item: str):
         try:
@@ -987,7 +1602,7 @@ class Bot:
             else:
                 price_line = "💰 <i>Fiyat bulunamadı</i>"
 
-            time_str = time.strftime("%H:%M", time.localtime())
+            time_str = now_hhmm()
 
             text = (
                 f"✅ <b>Test Sonucu</b>\n\n"
@@ -1008,79 +1623,110 @@ class Bot:
             await query.edit_message_text(
                 f"❌ <b>Test hatası!</b>\n\n"
                 f"🎯 <b>Item:</b> {esc_html(item)}\n"
-                f"🔧 <b>Hata:</b> {esc_html(str(e)[:50])}..."
+                f"🔧 <b>Hata:</b> {_fmt_err(e, 50)}..."
             )
 
     async def job_check_prices(self, c: ContextTypes.DEFAULT_TYPE):
-        arr = self.db.all_active()
-        log.info("JOB: %d aktif alarm kontrol ediliyor...", len(arr))
+        due = self.db.all_due(now_ts() - self.COOLDOWN)
+        log.info("JOB: %d alarm due, kontrol ediliyor...", len(due))
 
-        for a in arr:
-            last = a.get("last_check", 0) or 0
-            if time.time() - last < self.COOLDOWN:
-                log.info("⸻ Skip (cooldown): %s", a["item_name"])
-                continue
+        # Aynı itemi takip eden kullanıcılar tek fetch paylaşır; fetch'ler
+        # havuz boyutuyla sınırlı olarak paralel koşar.
+        groups: Dict[str, List[Dict]] = {}
+        for a in due:
+            groups.setdefault(a["item_name"].strip().lower(), []).append(a)
 
-            try:
-                await asyncio.sleep(random.uniform(1, 5))
-                res = await self.ttc.fetch_price(a["item_name"], headless=True)
-
-                if res.source == "captcha":
-                    msg = (
-                        f"⚠️ <b>{esc_html(a['item_name'])}</b> için captcha çıktı!\n\n"
-                        f"Lütfen <code>/test {esc_html(a['item_name'])}</code> komutu ile tarayıcıda aç ve çöz.\n"
-                        "Captcha çözülünce otomatik kontroller tekrar devam edecek."
-                    )
-                    await c.bot.send_message(
-                        chat_id=a["user_id"],
-                        text=msg,
-                        parse_mode=ParseMode.HTML
-                    )
-                    log.warning("JOB: captcha tespit edildi (item=%s). manuel /test ile storage_state güncelle.", a["item_name"])
-                    continue
+        sem = asyncio.Semaphore(TTC.POOL_SIZE)
+        # DB yazımları sweep boyunca biriktirilir, sonda tek transaction'da gider
+        price_updates: List[Tuple[int, int, int]] = []
+        notified: List[Tuple[int, int, int]] = []
 
-                if res.price is not None:
-                    self.db.set_price(a["id"], res.price)
-
-                if res.price is not None and res.price <= a["threshold_price"]:
-                    last_notified_price = a.get("last_notified_price")
-                    should_notify = (last_notified_price is None) or (res.price < last_notified_price)
-                    if should_notify:
-                        text = (
-                            "🔥 <b>SÜPER FIRSAT!</b>\n\n"
-                            f"🎯 <b>Item:</b> {esc_html(a['item_name'])}\n"
-                            f"💰 <b>Fiyat:</b> {fmt_gold(res.price)}g\n"
-                            f"🎯 <b>Eşiğin:</b> {fmt_gold(a['threshold_price'])}g\n"
-                            f"🏪 <b>Satıcı:</b> {esc_html(res.guild or 'Bilinmiyor')}\n"
-                            f"📍 <b>Lokasyon:</b> {esc_html(res.location or 'Bilinmiyor')}\n\n"
-                            f"⚡ Hemen satın almak için TTC'ye git!\n"
-                            f"🔗 <a href='{res.link}'>TTC Listing</a>\n"
-                            f"🌍 <b>Server:</b> {self._server_text()}"
-                        )
-
-                        kb = InlineKeyboardMarkup([[InlineKeyboardButton("🔗 TTC'de Satın Al", url=res.link)]])
-                        await c.bot.send_message(
-                            chat_id=a["user_id"],
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            reply_markup=kb,
-                            disable_web_page_preview=False,
-                        )
-                        self.db.set_notified(a["id"], res.price)
-                    else:
-                        log.info(
-                            "Skip notify (eşikten düşük ama yeni değil): item=%s price=%d last_notified=%s",
-                            a["item_name"], res.price, last_notified_price
-                        )
+        async def check_group(alerts: List[Dict]):
+            try:
+                # Hız sınırı fetch_price'ın içinde, sadece gerçek scrape'te
+                async with sem:
+                    res = await self.ttc.fetch_price(alerts[0]["item_name"], headless=True)
             except Exception as e:
-                log.warning("job item hata (%s): %s", a["item_name"], e)
+                log.warning("job item hata (%s): %s", alerts[0]["item_name"], e)
+                return
+            for a in alerts:
+                try:
+                    await self._handle_alert_result(c, a, res, price_updates, notified)
+                except Exception as e:
+                    log.warning("job item hata (%s): %s", a["item_name"], e)
+
+        await asyncio.gather(*(check_group(g) for g in groups.values()))
+        self.db.bulk_set_price(price_updates)
+        self.db.bulk_set_notified(notified)
+
+    async def _handle_alert_result(
+        self,
+        c: ContextTypes.DEFAULT_TYPE,
+        a: Dict,
+        res: PriceResult,
+        price_updates: List[Tuple[int, int, int]],
+        notified: List[Tuple[int, int, int]],
+    ):
+        """Tek bir alarmın fetch sonucunu işler; DB yazımları collector'lara eklenir."""
+        if res.source == "captcha":
+            msg = (
+                f"⚠️ <b>{esc_html(a['item_name'])}</b> için captcha çıktı!\n\n"
+                f"Lütfen <code>/test {esc_html(a['item_name'])}</code> komutu ile tarayıcıda aç ve çöz.\n"
+                "Captcha çözülünce otomatik kontroller tekrar devam edecek."
+            )
+            await self.sender.send(
+                c.bot.send_message,
+                chat_id=a["user_id"],
+                text=msg,
+                parse_mode=ParseMode.HTML
+            )
+            log.warning("JOB: captcha tespit edildi (item=%s). manuel /test ile storage_state güncelle.", a["item_name"])
+            return
+
+        if res.price is not None:
+            price_updates.append((res.price, now_ts(), a["id"]))
+
+        if res.price is not None and res.price <= a["threshold_price"]:
+            last_notified_price = a["last_notified_price"]
+            if Database.should_send(last_notified_price, res.price):
+                text = _DEAL_TMPL.format(
+                    kind="SÜPER FIRSAT!",
+                    item=esc_html(a['item_name']),
+                    price=fmt_gold(res.price),
+                    threshold=fmt_gold(a['threshold_price']),
+                    guild=esc_html(res.guild or 'Bilinmiyor'),
+                    loc=esc_html(res.location or 'Bilinmiyor'),
+                    extra=(
+                        f"\n🔗 <a href='{res.link}'>TTC Listing</a>\n"
+                        f"🌍 <b>Server:</b> {self._server_text()}"
+                    ),
+                )
+
+                kb = InlineKeyboardMarkup([[InlineKeyboardButton("🔗 TTC'de Satın Al", url=res.link)]])
+                await self.sender.send(
+                    c.bot.send_message,
+                    chat_id=a["user_id"],
+                    text=text,
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=kb,
+                    disable_web_page_preview=False,
+                )
+                notified.append((res.price, now_ts(), a["id"]))
+            else:
+                log.info(
+                    "Skip notify (eşikten düşük ama yeni değil): item=%s price=%d last_notified=%s",
+                    a["item_name"], res.price, last_notified_price
+                )
 
     async def on_message(self, u: Update, c: ContextTypes.DEFAULT_TYPE):
         if not u.message or not u.message.text:
             return
         txt = u.message.text.strip()
 
-        m = re.match(r"^(.*?)\s*\|\s*([0-9\.\,]+)$", txt)
+        # Ucuz ön filtre: '|' yoksa regex'e hiç girme
+        if "|" not in txt:
+            return
+        m = _ALERT_RE.match(txt)
         if not m:
             return
 
@@ -1091,27 +1737,25 @@ class Bot:
             return await u.message.reply_html("❌ Item adı çok kısa!")
 
         try:
-            thr = int(price_str.replace(".", "").replace(",", ""))
+            thr = int(price_str.translate(_STRIP_SEP))
             if thr <= 0:
                 return await u.message.reply_html("❌ Fiyat 0'dan büyük olmalı!")
         except Exception:
             return await u.message.reply_html("❌ Fiyat formatı hatalı! Örnek: Dreugh Wax | 50000")
 
-        existing_alerts = self.db.list_user(u.effective_user.id)
-        if len(existing_alerts) >= 15:
+        status, val = self.db.add_with_limit(
+            u.effective_user.id, u.effective_user.username or "", item, thr
+        )
+        if status == "limit":
             return await u.message.reply_html(
-                "⚠️ Maksimum 15 alarm ekleyebilirsin!\n"
+                f"⚠️ Maksimum {val} alarm ekleyebilirsin!\n"
                 "Önce bazı alarmları sil: <code>/list</code>"
             )
-
-        for alert in existing_alerts:
-            if alert['item_name'].lower() == item.lower():
-                return await u.message.reply_html(
-                    f"⚠️ <b>{esc_html(item)}</b> için zaten alarm var!\n"
-                    f"Mevcut eşik: <b>{fmt_gold(alert['threshold_price'])}g</b>"
-                )
-
-        self.db.add(u.effective_user.id, u.effective_user.username or "", item, thr)
+        if status == "dup":
+            return await u.message.reply_html(
+                f"⚠️ <b>{esc_html(item)}</b> için zaten alarm var!\n"
+                f"Mevcut eşik: <b>{fmt_gold(val)}g</b>"
+            )
 
         success_text = (
             "✅ <b>Hızlı alarm eklendi!</b>\n\n"
@@ -1129,14 +1773,42 @@ class Bot:
         await u.message.reply_html(success_text, reply_markup=kb)
 
     def run(self):
-        request = HTTPXRequest(
+        # İki ayrı havuz: getUpdates soketi long-poll boyunca (50 sn) park
+        # ettiği için send/edit çağrıları aynı havuzda onun arkasında
+        # kuyruklanmasın.
+        # connection_pool_size keep-alive limitini de belirler; http/2 tek
+        # TLS bağlantısı üzerinden multiplex eder (httpx[http2] kurulu).
+        api_request = HTTPXRequest(
+            connection_pool_size=32,
             connect_timeout=30.0,
             read_timeout=30.0,
             write_timeout=30.0,
             pool_timeout=30.0,
+            http_version="2",
+        )
+        poll_request = HTTPXRequest(
+            connection_pool_size=1,
+            connect_timeout=30.0,
+            # Long-poll 50 sn bekliyor; read bunun üstünde olmalı ki soket
+            # poll bitmeden kapanmasın.
+            read_timeout=70.0,
+            write_timeout=30.0,
+            pool_timeout=30.0,
+            http_version="2",
         )
 
-        app = Application.builder().token(BOT_TOKEN).request(request).build()
+        async def _post_shutdown(app):
+            # Kalıcı browser/context havuzu çıkışta düzgün kapatılsın
+            await self.ttc.shutdown()
+
+        app = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .request(api_request)
+            .get_updates_request(poll_request)
+            .post_shutdown(_post_shutdown)
+            .build()
+        )
 
         app.add_handler(CommandHandler("start", self.cmd_start))
         app.add_handler(CommandHandler("help", self.cmd_help))
@@ -1150,7 +1822,17 @@ class Bot:
         app.job_queue.run_repeating(self.job_check_prices, interval=CHECK_INTERVAL, first=30)
 
         log.info("🤖 Bot başlatılıyor...")
-        app.run_polling(close_loop=False)
+        # Sadece dinlenen update tipleri istenir: edited_message/channel_post
+        # vb. hiç inmez, getUpdates JSON'u ve dispatch yükü küçülür.
+        # 50 sn'lik long-poll: varsayılan 10 sn'ye göre getUpdates HTTPS
+        # round-trip sayısı ~5x azalır; poll_interval=0 ile cevap gelir
+        # gelmez yeniden beklenir.
+        app.run_polling(
+            close_loop=False,
+            poll_interval=0.0,
+            timeout=50,
+            allowed_updates=["message", "callback_query"],
+        )
 
 if __name__ == "__main__":
     Bot().run()